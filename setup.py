@@ -9,7 +9,6 @@ dependencies = [
     "markdown",
     "python-frontmatter",
     "click",
-    "pytz",
     "Pillow",
     "binx-og-image-generator>=0.5.0",
     "markdownify",
@@ -1,6 +1,6 @@
 import configparser
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 from io import BytesIO
 from os.path import expanduser
 from pathlib import Path
@@ -9,7 +9,6 @@ from typing import Optional, Union
 from urllib.parse import urlparse, ParseResult
 import mimetypes
 
-import pytz
 import requests
 from PIL import Image
 
@@ -174,15 +173,15 @@ class Post(dict):
     @property
     def date(self) -> datetime:
         return (
-            pytz.timezone("utc")
-            .localize(datetime.fromisoformat(self.get("date_gmt")))
+            datetime.fromisoformat(self.get("date_gmt"))
+            .replace(tzinfo=timezone.utc)
             .astimezone()
         )
 
     @date.setter
     def date(self, new_date: datetime):
         self["date"] = new_date
-        self["date_gmt"] = new_date.astimezone(pytz.timezone("utc"))
+        self["date_gmt"] = new_date.astimezone(timezone.utc)
 
     @property
     def status(self):
@@ -223,6 +222,7 @@ class Wordpress(object):
 
         self._media: List[Medium] = {}
         self._categories: Dict[str, int] = {}
+        self._categories_by_id: Dict[int, str] = {}
         self.headers = {
             "accept": "application/json",
             "User-Agent": "Wordpress markdown blog loader - Python",
@@ -314,6 +314,14 @@ class Wordpress(object):
             self._categories = {c["slug"]: c["id"] for c in self.get_all("categories")}
         return self._categories
 
+    @property
+    def categories_by_id(self) -> Dict[int, str]:
+        if not self._categories_by_id:
+            self._categories_by_id = {
+                id: name for name, id in self.categories.items()
+            }
+        return self._categories_by_id
+
     def search_for_image_by_slug(self, slug) -> Optional[Medium]:
         response = self.session.get(
             f"{self.url}/media",
@@ -332,6 +340,16 @@ class Wordpress(object):
         assert response.status_code == 200
         return response.content
 
+    def stream_media(self, url: str) -> requests.Response:
+        """
+        returns the media as a streaming response, so the caller can copy it
+        to disk without materializing the entire body in memory.
+        """
+        response = self.session.get(url, stream=True, auth=self.auth)
+        assert response.status_code == 200
+        response.raw.decode_content = True
+        return response
+
     def upload_media(self, slug: str, path: Path) -> Medium:
         old_content = []
 
@@ -1,32 +1,64 @@
 import logging
 import os
 import re
-from datetime import datetime
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional, Union
 from urllib.parse import urlparse, ParseResult
 
-import bs4
 import frontmatter
-import markdownify
-import pytz
+import yaml
 from PIL import Image
-from binx_og_image_generator import generate as generate_og_image
-from binx_og_image_generator.generator import Blog as ImageGeneratorBlog
 from markdown import markdown
 from wordpress_markdown_blog_loader.api import Post, Medium
 from wordpress_markdown_blog_loader.api import Wordpress, WordpressEndpoint
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+    from yaml import CSafeDumper as _YamlDumper
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+    from yaml import SafeDumper as _YamlDumper
+
+_IMAGE_RE = re.compile(
+    r'\!\[(?P<alt_text>[^]]*)\]\((?P<url>.*?)(?P<caption>\s*"[^"]*?")?\)'
+)
+_FENCE_RE = re.compile(r"(^```.*?$)(?P<code>.*?)(^```$)", flags=re.MULTILINE | re.DOTALL)
+_LOCAL_SCHEMES = frozenset(("", "file"))
+_REMOTE_SCHEMES = frozenset(("http", "https"))
+
 
 class Blog(object):
+    RENDER_EXTENSIONS = ["fenced_code", "attr_list"]
+
+    # fixed attribute layout: batch imports create one Blog per post, and slot
+    # descriptors are cheaper than a per-instance __dict__ behind ~15 properties
+    __slots__ = (
+        "dir",
+        "path",
+        "blog",
+        "uploaded_images",
+        "downloaded_images",
+        "_image_matches",
+        "_image_scan_cache",
+        "_rendered_cache",
+        "_banner",
+        "_og_banner",
+    )
+
     def __init__(self):
         self.dir: Path = None
         self.path: Path = None
         self.blog: frontmatter.Post = frontmatter.Post(content="")
         self.uploaded_images: dict[str, Image] = {}
-        self.markdown_image_pattern = re.compile(
-            r'\!\[(?P<alt_text>[^]]*)\]\((?P<url>.*?)(?P<caption>\s*"[^"]*?")?\)'
-        )
+        self.downloaded_images: dict[str, Path] = {}
+        self._image_matches: Optional[list[tuple]] = None
+        self._image_scan_cache: Optional[tuple] = None
+        self._rendered_cache: Optional[tuple] = None
+        self._banner: Optional[Image.Image] = None
+        self._og_banner: Optional[Image.Image] = None
 
     @staticmethod
     def load(path: str) -> "Blog":
@@ -37,13 +69,13 @@ class Blog(object):
             raise ValueError(f"{path} does not exist")
 
         with open(path, "r") as f:
-            result.blog = frontmatter.load(f)
+            result.blog = _load_frontmatter(f.read())
         return result
 
     def save(self):
         os.makedirs(self.dir, exist_ok=True)
         with open(self.path, "wb") as f:
-            frontmatter.dump(self.blog, f)
+            frontmatter.dump(self.blog, f, Dumper=_YamlDumper)
 
     @property
     def slug(self):
@@ -100,6 +132,22 @@ class Blog(object):
     @content.setter
     def content(self, content):
         self.blog.content = content
+        self._image_matches = None
+        self._image_scan_cache = None
+        self._rendered_cache = None
+
+    @property
+    def _image_references(self) -> list[tuple]:
+        """
+        all markdown image references in the content as (span, alt_text, url, caption)
+        tuples, scanned once and invalidated when the content changes.
+        """
+        if self._image_matches is None:
+            self._image_matches = [
+                (m.span(), m.group("alt_text"), m.group("url"), m.group("caption") or "")
+                for m in _IMAGE_RE.finditer(self.blog.content)
+            ]
+        return self._image_matches
 
     @property
     def og(self):
@@ -112,28 +160,26 @@ class Blog(object):
     @image.setter
     def image(self, image):
         self.blog.metadata["image"] = image
+        self._banner = None
 
     @property
     def og_image(self):
-        return self.og.get("image")
+        og = self.blog.metadata.get("og")
+        return og.get("image") if og else None
 
     @og_image.setter
     def og_image(self, og_image):
-        if "og" in self.blog.metadata:
-            self.blog.metadata["og"]["image"] = og_image
-        else:
-            self.blog.metadata["og"] = {"image": og_image}
+        self.blog.metadata.setdefault("og", {})["image"] = og_image
+        self._og_banner = None
 
     @property
     def og_description(self):
-        return self.og.get("description", "")
+        og = self.blog.metadata.get("og")
+        return og.get("description", "") if og else ""
 
     @og_description.setter
     def og_description(self, og_description):
-        if "og" in self.blog.metadata:
-            self.blog.metadata["og"]["description"] = og_description
-        else:
-            self.blog.metadata["og"] = {"description": og_description}
+        self.blog.metadata.setdefault("og", {})["description"] = og_description
 
     @property
     def excerpt(self):
@@ -176,6 +222,9 @@ class Blog(object):
         return Path(self.dir).joinpath(self.og_image) if self.og_image else None
 
     def generate_og_image(self):
+        from binx_og_image_generator import generate as generate_og_image
+        from binx_og_image_generator.generator import Blog as ImageGeneratorBlog
+
         in_file = str(self.image_path)
 
         if not self.og_image:
@@ -186,62 +235,96 @@ class Blog(object):
         generate_og_image(
             blog, in_file, out_file, overwrite=True, gradient_magnitude=0.9
         )
+        # the generator wrote a new og banner, drop the cached image
+        self._og_banner = None
 
     @property
     def banner(self) -> Optional["Image"]:
-        return Image.load(self.image_path) if self.image_path else None
+        if self._banner is None and self.image_path:
+            try:
+                self._banner = Image.open(self.image_path)
+            except FileNotFoundError:
+                return None
+        return self._banner
 
     @property
     def og_banner(self) -> Optional["Image"]:
-        return Image.load(self.og_image_path) if self.og_image_path else None
+        if self._og_banner is None and self.og_image_path:
+            try:
+                self._og_banner = Image.open(self.og_image_path)
+            except FileNotFoundError:
+                return None
+        return self._og_banner
+
+    def _replace_image_references(self, replacements: dict[str, str]) -> str:
+        """
+        returns the content with the given image urls rewritten, built in a single
+        slice-and-join pass over the cached image reference spans.
+        """
+        content = self.blog.content
+        parts = []
+        previous_end = 0
+        for (start, end), alt_text, url, caption in self._image_references:
+            replacement = replacements.get(url)
+            if replacement is None:
+                continue
+            parts.append(content[previous_end:start])
+            parts.append(f"![{alt_text}]({replacement}{caption})")
+            previous_end = end
+        parts.append(content[previous_end:])
+        return "".join(parts)
 
     @property
     def rendered(self):
-        def replace_references(match: re.Match):
-            image = self.uploaded_images.get(match.group("url"))
-            if image:
-                caption = ""
-                if match.group("caption"):
-                    caption = match.group("caption")
-                return f"![{match.group('alt_text')}]({image.url}{caption})"
-            return match.group(0)
+        key = (
+            self.blog.content,
+            tuple(sorted((url, image.url) for url, image in self.uploaded_images.items())),
+        )
+        if self._rendered_cache and self._rendered_cache[0] == key:
+            return self._rendered_cache[1]
 
-        content = self.markdown_image_pattern.sub(replace_references, self.content)
-        return markdown(content, extensions=["fenced_code", "attr_list"])
+        content = self._replace_image_references(
+            {url: image.url for url, image in self.uploaded_images.items()}
+        )
+        html = markdown(content, extensions=self.RENDER_EXTENSIONS)
+        self._rendered_cache = (key, html)
+        return html
+
+    def _scan_image_references(self) -> tuple[set[str], list[ParseResult]]:
+        """
+        classifies all image references in one pass, returning the local image paths
+        and the remote image urls. The result is cached until the content changes.
+        """
+        if self._image_scan_cache is None:
+            local_images: set[str] = set()
+            remote_images: list[ParseResult] = []
+            for span, alt_text, url, caption in self._image_references:
+                if url.startswith(("http://", "https://")):
+                    remote_images.append(urlparse(url))
+                elif ":" not in url and "?" not in url and "#" not in url:
+                    # a plain relative path, no need to parse it
+                    local_images.add(url)
+                else:
+                    u = urlparse(url)
+                    if u.scheme in _LOCAL_SCHEMES:
+                        local_images.add(u.path)
+                    elif u.scheme in _REMOTE_SCHEMES:
+                        # urlparse lowercases the scheme, so uppercase
+                        # variants bypass the prefix fast path above
+                        remote_images.append(u)
+            self._image_scan_cache = (local_images, remote_images)
+        return self._image_scan_cache
 
     @property
     def local_image_references(self) -> set[str]:
-        return set(
-            map(
-                lambda u: u.path,
-                filter(
-                    lambda u: u.scheme in ["", "file"],
-                    map(
-                        lambda u: urlparse(u),
-                        map(
-                            lambda m: m.group("url"),
-                            re.finditer(self.markdown_image_pattern, self.content),
-                        ),
-                    ),
-                ),
-            )
-        )
+        return self._scan_image_references()[0]
 
     def remote_image_references(self, endpoint: WordpressEndpoint) -> set[ParseResult]:
-        return set(
-            filter(
-                lambda u: u.scheme in ["https", "http"]
-                and endpoint.is_host_for(u)
-                and u.path.startswith("/wp-content/uploads/"),
-                map(
-                    lambda u: urlparse(u),
-                    map(
-                        lambda m: m.group("url"),
-                        re.finditer(self.markdown_image_pattern, self.content),
-                    ),
-                ),
-            ),
-        )
+        return {
+            u
+            for u in self._scan_image_references()[1]
+            if endpoint.is_host_for(u) and u.path.startswith("/wp-content/uploads/")
+        }
 
     def download_media(
         self,
@@ -251,44 +334,56 @@ class Blog(object):
     ):
         url = urlparse(url) if isinstance(url, str) else url
         logging.info("downloading %s as %s", url.geturl(), path.name)
-        raw = wordpress.get_media(url.geturl())
         os.makedirs(path.parent, exist_ok=True)
-        with open(path, "wb") as file:
-            file.write(raw)
+        with wordpress.stream_media(url.geturl()) as response, open(path, "wb") as file:
+            shutil.copyfileobj(response.raw, file, length=64 * 1024)
 
     def download_remote_images(self, wp: Wordpress, slug: str = ""):
         self.downloaded_images: dict[str, Path] = {}
+        targets: dict[ParseResult, Path] = {}
         for url in self.remote_image_references(wp.endpoint):
             name = Path(url.path).name.removeprefix(slug)
             name = name.removeprefix(slug)
-            path = Path("images").joinpath(name)
-            self.download_media(url, wp, Path(self.dir).joinpath(path))
-            self.downloaded_images[url.geturl()] = path
-
-        def replace_remote_image_references(match: re.Match):
-            url = match.group("url")
-            path = self.downloaded_images.get(url)
-            if path:
-                caption = ""
-                if match.group("caption"):
-                    caption = match.group("caption")
-                return f"![{match.group('alt_text')}]({path}{caption})"
-            return match.group(0)
-
-        self.content = self.markdown_image_pattern.sub(
-            replace_remote_image_references, self.content
+            targets[url] = Path("images").joinpath(name)
+
+        if targets:
+            Path(self.dir).joinpath("images").mkdir(parents=True, exist_ok=True)
+
+            def download(url: ParseResult) -> Path:
+                path = targets[url]
+                logging.info("downloading %s as %s", url.geturl(), path.name)
+                with wp.stream_media(url.geturl()) as response, open(
+                    Path(self.dir).joinpath(path), "wb"
+                ) as file:
+                    shutil.copyfileobj(response.raw, file, length=64 * 1024)
+                return path
+
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                for url, path in zip(targets, executor.map(download, targets)):
+                    self.downloaded_images[url.geturl()] = path
+
+        self.content = self._replace_image_references(
+            {url: str(path) for url, path in self.downloaded_images.items()}
         )
 
     def upload_local_images(self, wp: Wordpress):
         self.uploaded_images = {}
-        for filename in self.local_image_references:
+
+        def upload(filename: str) -> Optional[Medium]:
             path = Path(self.dir).joinpath(filename)
-            if not path.exists():
+            slug = self.slug + "-" + re.sub(r"[/\.\\]+", "-", path.stem.strip("-"))
+            try:
+                return wp.upload_media(slug, path)
+            except FileNotFoundError:
                 logging.warning("%s does not exist", path)
-                continue
+                return None
 
-            slug = self.slug + "-" + re.sub(r"[/\.\\]+", "-", path.stem.strip("-"))
-            self.uploaded_images[filename] = wp.upload_media(slug, path)
+        filenames = list(self.local_image_references)
+        if filenames:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                for filename, medium in zip(filenames, executor.map(upload, filenames)):
+                    if medium:
+                        self.uploaded_images[filename] = medium
 
     def to_wordpress(self, wp: Wordpress) -> dict:
         author = wp.get_unique_user_by_name(self.author)
@@ -298,7 +393,7 @@ class Blog(object):
             "slug": self.slug,
             "author": author.id,
             "date": self.date.isoformat(),
-            "date_gmt": self.date.astimezone(pytz.UTC).isoformat(),
+            "date_gmt": self.date.astimezone(timezone.utc).isoformat(),
             "content": self.rendered,
             "format": "standard",
             "status": self.status,
@@ -310,9 +405,7 @@ class Blog(object):
             result["permalink_template"] = self.permalink_template
 
         if self.excerpt:
-            result["excerpt"] = markdown(
-                self.excerpt, extensions=["fenced_code", "attr_list"]
-            )
+            result["excerpt"] = markdown(self.excerpt, extensions=self.RENDER_EXTENSIONS)
 
         metadesc = self.og_description if self.og_description else self.excerpt
         result["meta"] = {"yoast_wpseo_metadesc": metadesc}
@@ -325,7 +418,9 @@ class Blog(object):
         """
         convert a Wordpress post to a FrontMatter post
         """
-        categories = {id: name for name, id in wordpress.categories.items()}
+        import markdownify
+
+        categories = wordpress.categories_by_id
 
         blog = Blog()
         blog.dir = (
@@ -375,25 +470,19 @@ class Blog(object):
                 )
             blog.download_media(og_image.geturl(), wordpress, blog.og_image_path)
 
-        if post.excerpt:
-            blog.excerpt = markdownify.markdownify(
-                post.excerpt,
-                STRIP=True,
-                MARKDOWN_EXTENSIONS=[
-                    "markdown.extensions.fenced_code",
-                    "markdown.extensions.extra",
-                ],
-                code_language_callback=_code_block_language,
-            ).strip()
-        blog.content = markdownify.markdownify(
-            post.content,
-            STRIP=True,
-            MARKDOWN_EXTENSIONS=[
+        markdownify_options = {
+            "STRIP": True,
+            "MARKDOWN_EXTENSIONS": [
                 "markdown.extensions.fenced_code",
                 "markdown.extensions.extra",
             ],
-            code_language_callback=_code_block_language,
-        )
+            "code_language_callback": _code_block_language,
+        }
+        if post.excerpt:
+            blog.excerpt = markdownify.markdownify(
+                post.excerpt, **markdownify_options
+            ).strip()
+        blog.content = markdownify.markdownify(post.content, **markdownify_options)
 
         return blog
 
@@ -441,6 +530,32 @@ class Blog(object):
         self.content = remove_span_tags_from_code(self.content)
 
 
+def _load_frontmatter(text: str) -> frontmatter.Post:
+    r"""
+    parses a frontmatter document, reading the YAML header with libyaml when available.
+    PyYAML's pure-Python loader is an order of magnitude slower, which dominates batch
+    imports over many posts.
+
+    >>> post = _load_frontmatter('---\ntitle: hello\n---\nworld\n')
+    >>> post.metadata
+    {'title': 'hello'}
+    >>> post.content
+    'world'
+    >>> _load_frontmatter('no header\n').content
+    'no header'
+    """
+    if text.startswith("---\n"):
+        end = text.find("\n---\n", 3)
+        if end != -1:
+            metadata = yaml.load(text[4 : end + 1], Loader=_YamlLoader) or {}
+            if isinstance(metadata, dict):
+                return frontmatter.Post(text[end + 5 :].strip(), **metadata)
+    if text.lstrip().startswith("---"):
+        # non-standard delimiters, let python-frontmatter sort it out
+        return frontmatter.loads(text)
+    return frontmatter.Post(text.strip())
+
+
 def remove_span_tags_from_code(markdown: str) -> str:
     r"""
     Removes <span> tags from the markdown code blocks. In some upgrade of Wordpress, the code
@@ -454,27 +569,53 @@ def remove_span_tags_from_code(markdown: str) -> str:
     >>> remove_span_tags_from_code(doc)
     '```html\n<span class=bla>spanned code</span>\n```\n'
     """
-    if "</span>" not in markdown:
+    if "</span>" not in markdown or "```" not in markdown or not _FENCE_RE.search(
+        markdown
+    ):
         return markdown
 
-    pattern = re.compile(
-        "(^```.*?$)(?P<code>.*?)(^```$)", flags=re.MULTILINE | re.DOTALL | re.VERBOSE
-    )
-
     def _remove_span_tags(match):
         if match.group(0).startswith("```html"):
             return match.group(0)
 
-        return (
-            match.group(1)
-            + re.sub(r"</?span[^>]*?>", "", match.group("code"))
-            + match.group(3)
-        )
+        return match.group(1) + _strip_span_tags(match.group("code")) + match.group(3)
+
+    return _FENCE_RE.sub(_remove_span_tags, markdown)
+
 
-    return pattern.sub(_remove_span_tags, markdown)
+def _strip_span_tags(code: str) -> str:
+    r"""
+    removes <span ...> and </span> tokens with plain str.find scanning; the tags
+    have a fixed shape, so no regex engine is needed per code block.
+
+    >>> _strip_span_tags('<span class="x">a</span>b')
+    'ab'
+    >>> _strip_span_tags('a</span >b')
+    'ab'
+    >>> _strip_span_tags('plain')
+    'plain'
+    """
+    parts = []
+    position = 0
+    while True:
+        open_tag = code.find("<span", position)
+        close_tag = code.find("</span", position)
+        if open_tag == -1 and close_tag == -1:
+            break
+        if close_tag == -1 or (open_tag != -1 and open_tag < close_tag):
+            start = open_tag
+        else:
+            start = close_tag
+        end = code.find(">", start)
+        if end == -1:
+            break
+        parts.append(code[position:start])
+        position = end + 1
+    parts.append(code[position:])
+    return "".join(parts)
 
 
-def _code_block_language(code_block: bs4.element.Tag) -> str:
+def _code_block_language(code_block: "bs4.element.Tag") -> str:
     """
     determines the code block language from tag attribute class
     >>> import bs4
@@ -484,13 +625,7 @@ def _code_block_language(code_block: bs4.element.Tag) -> str:
     ''
     """
     code_tag = code_block.find("code")
+    classes = code_tag.get("class", []) if code_tag else []
     return next(
-        map(
-            lambda l: l.replace("language-", ""),
-            filter(
-                lambda c: c.startswith("language-"),
-                code_tag.get("class", []) if code_tag else "",
-            ),
-        ),
-        "",
+        (c.removeprefix("language-") for c in classes if c.startswith("language-")), ""
     )